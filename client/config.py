@@ -7,28 +7,41 @@
 import os
 import hashlib
 import hmac
+import functools
+
+# 环境变量在进程生命周期内不会变化，导入时读取一次
+_CLIENT_ENV = os.environ.get('CLIENT_ENV', 'production')
+_VPS_URL = os.environ.get('VPS_URL', 'https://verify.yuzeguitar.me')
+_CLIENT_SECRET_KEY = os.environ.get('CLIENT_SECRET_KEY')
+_API_KEY_SALT = os.environ.get('API_KEY_SALT', 'musicqr_api_salt_2024')
 
 class ClientConfig:
     """客户端配置类"""
     
     # VPS服务器配置
-    VPS_URL = os.environ.get('VPS_URL', 'https://verify.yuzeguitar.me')
+    VPS_URL = _VPS_URL
     
     # API密钥配置
     # 注意：这个密钥需要与服务器端的密钥匹配
-    SECRET_KEY = os.environ.get('CLIENT_SECRET_KEY', 'your-secret-key-here')
-    API_KEY_SALT = os.environ.get('API_KEY_SALT', 'musicqr_api_salt_2024')
+    SECRET_KEY = _CLIENT_SECRET_KEY or 'your-secret-key-here'
+    API_KEY_SALT = _API_KEY_SALT
     
     # 生成API密钥
-    @property
-    def API_KEY(self):
-        """动态生成API密钥"""
+    @staticmethod
+    @functools.lru_cache(maxsize=None)
+    def _derive_api_key(secret: str, salt: str) -> str:
+        """根据密钥和盐值派生API密钥（结果按参数缓存）"""
         return hmac.new(
-            self.SECRET_KEY.encode(),
-            self.API_KEY_SALT.encode(),
+            secret.encode(),
+            salt.encode(),
             hashlib.sha256
         ).hexdigest()
     
+    @property
+    def API_KEY(self):
+        """API密钥，同一组 SECRET_KEY/API_KEY_SALT 只计算一次"""
+        return self._derive_api_key(self.SECRET_KEY, self.API_KEY_SALT)
+    
     # 本地文件配置
     OUTPUT_DIR = 'output'
     DATA_DIR = 'data'
@@ -72,7 +85,7 @@ class ClientConfig:
         """打印当前配置"""
         print("=== 客户端配置 ===")
         print(f"VPS地址: {cls.VPS_URL}")
-        print(f"API密钥: {cls().API_KEY[:8]}...")
+        print(f"API密钥: {cls._derive_api_key(cls.SECRET_KEY, cls.API_KEY_SALT)[:8]}...")
         print(f"输出目录: {cls.OUTPUT_DIR}")
         print(f"数据目录: {cls.DATA_DIR}")
         print(f"默认PDF格式: {cls.DEFAULT_ORIENTATION}")
@@ -99,7 +112,7 @@ class ProductionConfig(ClientConfig):
     """生产环境配置"""
     VPS_URL = 'https://verify.yuzeguitar.me'
     # 生产环境必须从环境变量读取密钥
-    SECRET_KEY = os.environ.get('CLIENT_SECRET_KEY')
+    SECRET_KEY = _CLIENT_SECRET_KEY
     
     @classmethod
     def validate_config(cls):
@@ -114,10 +127,11 @@ class ProductionConfig(ClientConfig):
         return errors
 
 # 配置选择
+@functools.lru_cache(maxsize=None)
 def get_config(env=None):
-    """获取配置类"""
+    """获取配置类（结果按环境名缓存）"""
     if env is None:
-        env = os.environ.get('CLIENT_ENV', 'production')
+        env = _CLIENT_ENV
     
     if env == 'development':
         return DevelopmentConfig
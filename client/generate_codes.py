@@ -6,33 +6,280 @@
 """
 
 import os
+import io
+import gzip
 import json
+import sqlite3
 import uuid
 import qrcode
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import hashlib
 import hmac
 from datetime import datetime
-from reportlab.lib.pagesizes import A4
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+from reportlab.lib.pagesizes import A4, landscape
+from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, PageBreak, Image
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.units import cm, mm
 from reportlab.lib import colors
 from reportlab.lib.enums import TA_CENTER, TA_LEFT
-from typing import List, Dict, Tuple, Optional
+from typing import List, Dict, Tuple, Optional, Iterator
 import secrets
-import string
 import subprocess
 import sys
 import re
 import time
+import functools
+from contextlib import closing
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+
+try:
+    # segno 编码速度远快于 qrcode 的纯Python掩码评分，可用时优先使用
+    import segno
+except ImportError:
+    segno = None
+
+try:
+    # orjson 序列化速度远快于标准库 json，可用时优先使用
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    # ijson 可流式解析旧版 codes.json，避免一次性载入整个数组
+    import ijson
+except ImportError:
+    ijson = None
 
 # 导入配置
 from config import ClientConfig
 
+# 验证码字母表（排除容易混淆的 0/O/1/I），与客户端配置保持一致，长度为32
+_ALPHABET = ClientConfig.CODE_ALPHABET.encode('ascii')
+assert len(_ALPHABET) == 32
+
+
+# PDF字体候选（按优先级依次尝试注册），都不可用时使用ReportLab内置字体
+_PDF_FONTS = {
+    "landscape": (
+        (('Bodoni72', 'fonts/Bodoni 72.ttc'),
+         ('BrushScript', '/System/Library/Fonts/Supplemental/Brush Script.ttf'),
+         ('Baskerville', '/System/Library/Fonts/Baskerville.ttc')),
+        'Times-Roman',
+        (('PTSerif', '/System/Library/Fonts/Supplemental/PTSerif.ttc'),
+         ('Monaco', '/System/Library/Fonts/Monaco.ttf')),
+        'Courier-Bold',
+    ),
+    "portrait": (
+        (('Bodoni72', 'fonts/Bodoni 72.ttc'),),
+        'Times-Roman',
+        (('PTSerif', '/System/Library/Fonts/Supplemental/PTSerif.ttc'),),
+        'Courier-Bold',
+    ),
+}
+
+
+def _register_font(candidates: Tuple[Tuple[str, str], ...], fallback: str) -> str:
+    """依次尝试注册候选字体，返回第一个可用的字体名"""
+    for font_name, font_path in candidates:
+        try:
+            pdfmetrics.registerFont(TTFont(font_name, font_path))
+            return font_name
+        except:
+            continue
+    return fallback
+
+
+@functools.lru_cache(maxsize=None)
+def _register_fonts(orientation: str) -> Tuple[str, str]:
+    """
+    注册PDF字体（每种页面方向只解析一次字体文件）
+    
+    Args:
+        orientation: 页面方向，"landscape" 或 "portrait"
+        
+    Returns:
+        Tuple[str, str]: (标题字体, 验证码字体)
+    """
+    title_fonts, title_fallback, code_fonts, code_fallback = _PDF_FONTS[orientation]
+    return _register_font(title_fonts, title_fallback), _register_font(code_fonts, code_fallback)
+
+
+@functools.lru_cache(maxsize=None)
+def _pdf_styles(orientation: str) -> Tuple[ParagraphStyle, ParagraphStyle]:
+    """
+    构建PDF段落样式（每种页面方向只构建一次）
+    
+    Args:
+        orientation: 页面方向，"landscape" 或 "portrait"
+        
+    Returns:
+        Tuple[ParagraphStyle, ParagraphStyle]: (标题样式, 验证码样式)
+    """
+    title_font, code_font = _register_fonts(orientation)
+    styles = getSampleStyleSheet()
+    
+    if orientation == "landscape":
+        title_style = ParagraphStyle(
+            'CustomTitle',
+            parent=styles['Normal'],
+            fontName=title_font,
+            fontSize=24,
+            spaceAfter=40,
+            alignment=TA_CENTER,
+            textColor=colors.black
+        )
+        
+        code_style = ParagraphStyle(
+            'CodeStyle',
+            parent=styles['Normal'],
+            fontName=code_font,
+            fontSize=18,
+            spaceBefore=20,
+            alignment=TA_CENTER,
+            textColor=colors.black
+        )
+    else:
+        title_style = ParagraphStyle(
+            'PortraitTitle',
+            parent=styles['Normal'],
+            fontName=title_font,
+            fontSize=20,
+            spaceAfter=30,
+            alignment=TA_CENTER,
+            textColor=colors.black,
+            leading=24
+        )
+        
+        code_style = ParagraphStyle(
+            'PortraitCode',
+            parent=styles['Normal'],
+            fontName=code_font,
+            fontSize=16,
+            spaceBefore=15,
+            alignment=TA_CENTER,
+            textColor=colors.black,
+            leading=20
+        )
+    
+    return title_style, code_style
+
+
+def _dumps(obj) -> bytes:
+    """序列化为紧凑的UTF-8 JSON字节串"""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def _dumps_line(obj) -> bytes:
+    """序列化为一行紧凑JSON（含结尾换行），用于JSONL文件"""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_APPEND_NEWLINE)
+    return _dumps(obj) + b'\n'
+
+
+def _loads(data):
+    """解析JSON（bytes 或 str）"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+@functools.lru_cache(maxsize=None)
+def _qr_version(vps_url: str, code_length: int = 12) -> int:
+    """
+    计算验证URL所需的二维码版本
+    
+    同一批次的URL前缀相同、验证码等长，编码后的版本必然一致，
+    因此只需计算一次，后续编码可跳过版本搜索。
+    
+    Args:
+        vps_url: VPS服务器地址
+        code_length: 验证码长度
+        
+    Returns:
+        int: 二维码版本
+    """
+    sample_url = f"{vps_url}/?code={'A' * code_length}"
+    
+    if segno is not None:
+        return segno.make(sample_url, error='l', micro=False, boost_error=False).version
+    
+    qr = qrcode.QRCode(error_correction=qrcode.constants.ERROR_CORRECT_L)
+    qr.add_data(sample_url)
+    qr.make(fit=True)
+    return qr.version
+
+
+def _render_qr(code: str, qrcode_dir: str, vps_url: str, version: Optional[int] = None) -> Tuple[str, bytes]:
+    """
+    渲染单个二维码并写入PNG文件（模块级函数，便于在进程池中执行）
+    
+    Args:
+        code: 验证码
+        qrcode_dir: 二维码图片目录
+        vps_url: VPS服务器地址
+        version: 二维码版本，为None时自动选择
+        
+    Returns:
+        Tuple[str, bytes]: (二维码图片文件路径, PNG数据)
+    """
+    # 构建验证URL - 指向VPS验证页面
+    verify_url = f"{vps_url}/?code={code}"
+    img_path = os.path.join(qrcode_dir, f"qr_{code}.png")
+    
+    # 先在内存中完成PNG编码，再一次性写盘，避免编码器分块多次写文件
+    buf = io.BytesIO()
+    
+    if segno is not None:
+        # 与下方 qrcode 参数一致：纠错等级L、模块10像素、边框4模块
+        qr = segno.make(verify_url, error='l', version=version, micro=False, boost_error=False)
+        qr.save(buf, kind='png', scale=10, border=4, dark='black', light='white')
+    else:
+        # 生成二维码
+        qr = qrcode.QRCode(
+            version=version or 1,
+            error_correction=qrcode.constants.ERROR_CORRECT_L,
+            box_size=10,
+            border=4,
+        )
+        qr.add_data(verify_url)
+        qr.make(fit=version is None)
+        
+        # 生成二维码图片
+        qr_img = qr.make_image(fill_color="black", back_color="white")
+        qr_img.save(buf)
+    
+    # 保存图片
+    png_data = buf.getvalue()
+    with open(img_path, 'wb') as f:
+        f.write(png_data)
+    
+    return img_path, png_data
+
+
 class VPSQRCodeGenerator:
     """VPS版本二维码生成器类"""
     
+    # 验证码字母表
+    CODE_ALPHABET = _ALPHABET
+    # 随机字节 -> 字母表字符的映射表（按低5位映射，256可被32整除，无偏差）
+    CODE_TRANSLATION = CODE_ALPHABET * 8
+    # 字母表字符 -> base32 数字，用于把验证码压缩为整数（每字符5位）
+    CODE_TO_BASE32 = str.maketrans(CODE_ALPHABET.decode('ascii'), '0123456789ABCDEFGHIJKLMNOPQRSTUV')
+    # 同步记录文件超过该大小时合并回 codes.jsonl
+    SYNCED_FILE_COMPACT_BYTES = 1024 * 1024
+    # 同步请求头
+    JSON_HEADERS = {'Content-Type': 'application/json'}
+    GZIP_JSON_HEADERS = {'Content-Type': 'application/json', 'Content-Encoding': 'gzip'}
+    # 请求体超过该大小时使用gzip压缩
+    GZIP_MIN_BYTES = 4096
+    
     def __init__(self, vps_url: str = None, api_key: str = None):
         """
         初始化二维码生成器
@@ -50,10 +297,31 @@ class VPSQRCodeGenerator:
         self.qrcode_dir = os.path.join(self.output_dir, "qrcodes")
         self.data_dir = "data"
         
+        # 数据文件：验证码记录追加写入JSONL，同步状态单独追加记录
+        self.codes_file = os.path.join(self.data_dir, "codes.jsonl")
+        self.synced_file = os.path.join(self.data_dir, "synced_codes.txt")
+        # 已有验证码的唯一索引，用于查重，避免每次解析全部历史数据
+        self.index_file = os.path.join(self.data_dir, "codes_index.db")
+        
         # 创建必要的目录
         os.makedirs(self.qrcode_dir, exist_ok=True)
         os.makedirs(self.data_dir, exist_ok=True)
         
+        self._migrate_legacy_codes_file()
+        
+        # 最近一批二维码的PNG数据：验证码 -> PNG字节
+        self._qr_png_cache = {}
+        
+        # 复用HTTP会话（keep-alive连接池），多次请求无需重复TCP/TLS握手
+        self._session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=4,
+            pool_maxsize=8,
+            max_retries=Retry(total=self.config.MAX_RETRIES, backoff_factor=0.3)
+        )
+        self._session.mount('https://', adapter)
+        self._session.mount('http://', adapter)
+        
         print(f"✅ VPS地址: {self.vps_url}")
         print(f"✅ 本地输出目录: {self.output_dir}")
     
@@ -67,47 +335,127 @@ class VPSQRCodeGenerator:
         Returns:
             str: 唯一验证码
         """
-        # 使用字母和数字，排除容易混淆的字符
-        alphabet = string.ascii_uppercase + string.digits
-        alphabet = alphabet.replace('0', '').replace('O', '').replace('I', '').replace('1', '')
-        
-        return ''.join(secrets.choice(alphabet) for _ in range(length))
+        # 一次性读取全部随机字节，用映射表在C层一步转换为字母表字符，无需逐字符调用 secrets.choice
+        return secrets.token_bytes(length).translate(self.CODE_TRANSLATION).decode('ascii')
     
-    def create_qrcode(self, code: str) -> str:
+    def _code_to_u64(self, code: str) -> int:
         """
-        创建单个二维码
+        将验证码压缩为整数（12位 x 5bit = 60bit，可直接作为SQLite整数主键）
         
         Args:
             code: 验证码
             
         Returns:
-            str: 二维码图片文件路径
+            int: 压缩后的整数
         """
-        # 构建验证URL - 指向VPS验证页面
-        verify_url = f"{self.vps_url}/?code={code}"
+        return int(code.translate(self.CODE_TO_BASE32), 32)
+    
+    def _packed_codes(self, codes):
+        """将验证码序列逐个压缩为整数，跳过无法压缩的异常数据"""
+        for code in codes:
+            try:
+                yield (self._code_to_u64(code),)
+            except ValueError:
+                continue
+    
+    def _open_code_index(self) -> sqlite3.Connection:
+        """
+        打开已有验证码索引，首次使用时从 codes.jsonl 导入历史验证码
         
-        # 生成二维码
-        qr = qrcode.QRCode(
-            version=1,
-            error_correction=qrcode.constants.ERROR_CORRECT_L,
-            box_size=10,
-            border=4,
-        )
-        qr.add_data(verify_url)
-        qr.make(fit=True)
+        Returns:
+            sqlite3.Connection: 索引数据库连接
+        """
+        conn = sqlite3.connect(self.index_file)
+        conn.execute("CREATE TABLE IF NOT EXISTS code_keys (key INTEGER PRIMARY KEY)")
+        
+        if conn.execute("SELECT 1 FROM code_keys LIMIT 1").fetchone() is None:
+            conn.executemany(
+                "INSERT OR IGNORE INTO code_keys (key) VALUES (?)",
+                self._packed_codes(
+                    item['code'] for item in self._iter_codes(merge_synced=False) if 'code' in item
+                )
+            )
+            conn.commit()
         
-        # 生成二维码图片
-        qr_img = qr.make_image(fill_color="black", back_color="white")
+        return conn
+    
+    def _taken_keys(self, cursor: sqlite3.Cursor, keys: List[int], chunk_size: int = 500) -> set:
+        """
+        查询 keys 中已存在于验证码索引的部分
+        
+        Args:
+            cursor: 索引数据库游标
+            keys: 待检查的压缩验证码
+            chunk_size: 每次查询的参数个数（SQLite 对参数数量有上限）
+            
+        Returns:
+            set: 已存在的压缩验证码
+        """
+        taken = set()
+        for i in range(0, len(keys), chunk_size):
+            chunk = keys[i:i + chunk_size]
+            placeholders = ','.join('?' * len(chunk))
+            cursor.execute(f"SELECT key FROM code_keys WHERE key IN ({placeholders})", chunk)
+            taken.update(row[0] for row in cursor.fetchall())
+        return taken
+    
+    def _generate_codes_bulk(self, count: int, index_conn: sqlite3.Connection, length: int = 12) -> List[str]:
+        """
+        批量生成互不重复且未被占用的验证码，并登记到验证码索引
+        
+        验证码空间为 32^12 ≈ 2^60，单批次内与已有验证码冲突的概率可忽略，
+        因此先整批直接写入索引，仅在写入数量不符（发生冲突）时才逐个剔除冲突项。
+        
+        Args:
+            count: 生成数量
+            index_conn: 验证码索引连接
+            length: 验证码长度
+            
+        Returns:
+            List[str]: 新验证码列表
+        """
+        new_codes = []
+        cursor = index_conn.cursor()
+        
+        while len(new_codes) < count:
+            need = count - len(new_codes)
+            # 一次读取全部随机字节并映射到字母表
+            raw = secrets.token_bytes(need * length).translate(self.CODE_TRANSLATION).decode('ascii')
+            batch = {}
+            for i in range(0, len(raw), length):
+                code = raw[i:i + length]
+                batch[self._code_to_u64(code)] = code
+            
+            cursor.executemany("INSERT OR IGNORE INTO code_keys (key) VALUES (?)", ((key,) for key in batch))
+            if cursor.rowcount != len(batch):
+                # 极少数情况下发生冲突：回滚本批次，剔除冲突项后重新写入，缺少的名额下一轮补齐
+                index_conn.rollback()
+                for key in self._taken_keys(cursor, list(batch)):
+                    del batch[key]
+                cursor.executemany("INSERT INTO code_keys (key) VALUES (?)", ((key,) for key in batch))
+            
+            index_conn.commit()
+            new_codes.extend(batch.values())
         
-        # 保存图片
-        img_path = os.path.join(self.qrcode_dir, f"qr_{code}.png")
-        qr_img.save(img_path)
+        return new_codes
+    
+    def create_qrcode(self, code: str) -> str:
+        """
+        创建单个二维码
         
+        Args:
+            code: 验证码
+            
+        Returns:
+            str: 二维码图片文件路径
+        """
+        img_path, png_data = _render_qr(code, self.qrcode_dir, self.vps_url, _qr_version(self.vps_url, len(code)))
+        self._qr_png_cache[code] = png_data
         return img_path
     
     def generate_codes_data(self, count: int) -> List[Dict]:
         """
-        生成指定数量的验证码数据
+        生成指定数量的验证码数据（created_date 为批次创建时间）
         
         Args:
             count: 生成数量
@@ -115,35 +463,51 @@ class VPSQRCodeGenerator:
         Returns:
             List[Dict]: 验证码数据列表
         """
-        codes_data = []
-        existing_codes = set()
+        return self._generate_codes(count)[0]
+    
+    def _generate_codes(self, count: int) -> Tuple[List[Dict], List[Dict]]:
+        """
+        生成验证码数据，并在同一次遍历中构建同步请求所需的精简数据
         
-        # 读取现有验证码以避免重复
-        codes_file = os.path.join(self.data_dir, "codes.json")
-        if os.path.exists(codes_file):
-            try:
-                with open(codes_file, 'r', encoding='utf-8') as f:
-                    existing_data = json.load(f)
-                    existing_codes = {item['code'] for item in existing_data if isinstance(item, dict) and 'code' in item}
-            except:
-                pass
-        
-        print(f"📊 已有 {len(existing_codes)} 个验证码，开始生成新的...")
-        
-        for i in range(count):
-            # 确保验证码唯一
-            while True:
-                code = self.generate_unique_code()
-                if code not in existing_codes:
-                    existing_codes.add(code)
-                    break
+        同一批次的验证码共用同一个 created_date（批次创建时间）。
+        
+        Args:
+            count: 生成数量
             
-            # 创建二维码图片
-            img_path = self.create_qrcode(code)
+        Returns:
+            Tuple[List[Dict], List[Dict]]: (验证码数据列表, 同步数据列表)
+        """
+        codes_data = []
+        sync_payload = []
+        
+        # 通过验证码索引查重，无需读取全部历史数据
+        with closing(self._open_code_index()) as index_conn:
+            existing_count = index_conn.execute("SELECT COUNT(*) FROM code_keys").fetchone()[0]
+            print(f"📊 已有 {existing_count} 个验证码，开始生成新的...")
             
+            # 一次性批量生成所需数量的唯一验证码
+            codes = self._generate_codes_bulk(count, index_conn)
+        
+        # 所有验证码的URL长度相同，二维码版本只需计算一次
+        version = _qr_version(self.vps_url)
+        
+        # 二维码之间互不依赖，使用进程池并行渲染（图片由子进程直接写盘）
+        with ProcessPoolExecutor(max_workers=os.cpu_count()) as executor:
+            rendered = list(executor.map(
+                _render_qr, codes, repeat(self.qrcode_dir), repeat(self.vps_url), repeat(version), chunksize=8
+            ))
+        
+        # 保留本批次的PNG数据（每张约1KB），生成PDF时无需再从磁盘读取
+        img_paths = [img_path for img_path, _ in rendered]
+        self._qr_png_cache = {code: png_data for code, (_, png_data) in zip(codes, rendered)}
+        
+        # 批次创建时间，所有验证码共用
+        created_date = datetime.now().isoformat()
+        
+        for i, (code, img_path) in enumerate(zip(codes, img_paths)):
             code_data = {
                 "code": code,
-                "created_date": datetime.now().isoformat(),
+                "created_date": created_date,
                 "activated": False,
                 "activation_date": None,
                 "img_path": img_path,
@@ -152,43 +516,111 @@ class VPSQRCodeGenerator:
             }
             
             codes_data.append(code_data)
+            sync_payload.append({"code": code, "created_date": created_date})
             print(f"✅ 已生成验证码 {i+1}/{count}: {code}")
         
-        return codes_data
+        return codes_data, sync_payload
     
-    def save_codes_data(self, codes_data: List[Dict]):
+    def _migrate_legacy_codes_file(self):
+        """将旧版 codes.json（整体JSON数组）一次性转换为 codes.jsonl"""
+        legacy_file = os.path.join(self.data_dir, "codes.json")
+        if not os.path.exists(legacy_file) or os.path.exists(self.codes_file):
+            return
+        
+        try:
+            with open(legacy_file, 'rb') as f:
+                # 有 ijson 时逐条流式读取，否则整体解析
+                legacy_codes = ijson.items(f, 'item', use_float=True) if ijson is not None else _loads(f.read())
+                self._write_codes_file(item for item in legacy_codes if isinstance(item, dict))
+            os.replace(legacy_file, legacy_file + ".bak")
+            
+            print(f"🔄 已将 {legacy_file} 转换为 {self.codes_file}")
+        except Exception as e:
+            print(f"⚠️ 转换旧版数据文件失败: {e}")
+    
+    def _load_synced(self) -> Dict[str, str]:
         """
-        保存验证码数据到JSON文件
+        读取同步记录
+        
+        Returns:
+            Dict[str, str]: 验证码 -> 同步时间
+        """
+        synced = {}
+        if os.path.exists(self.synced_file):
+            with open(self.synced_file, 'r', encoding='utf-8') as f:
+                for line in f:
+                    code, _, sync_date = line.rstrip('\n').partition('\t')
+                    if code:
+                        synced[code] = sync_date or None
+        return synced
+    
+    def _iter_codes(self, merge_synced: bool = True) -> Iterator[Dict]:
+        """
+        逐条读取验证码记录（流式，不在内存中保留整个文件）
         
         Args:
-            codes_data: 验证码数据列表
+            merge_synced: 是否合并同步记录中的同步状态
+            
+        Yields:
+            Dict: 验证码记录
         """
-        # 读取现有数据
-        codes_file = os.path.join(self.data_dir, "codes.json")
-        existing_codes = []
+        if not os.path.exists(self.codes_file):
+            return
         
-        if os.path.exists(codes_file):
-            try:
-                with open(codes_file, 'r', encoding='utf-8') as f:
-                    existing_codes = json.load(f)
-            except:
-                existing_codes = []
+        synced = self._load_synced() if merge_synced else {}
+        
+        with open(self.codes_file, 'rb') as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                code_info = _loads(line)
+                if code_info.get('code') in synced:
+                    code_info['synced_to_vps'] = True
+                    code_info['sync_date'] = synced[code_info['code']]
+                yield code_info
+    
+    def _write_codes_file(self, codes_data):
+        """
+        以JSONL格式整体重写验证码文件（先写临时文件再替换）
         
-        # 合并数据
-        all_codes = existing_codes + codes_data
+        Args:
+            codes_data: 验证码数据（可迭代）
+        """
+        tmp_file = self.codes_file + ".tmp"
+        with open(tmp_file, 'wb') as f:
+            f.writelines(_dumps_line(code_info) for code_info in codes_data)
+        os.replace(tmp_file, self.codes_file)
+    
+    def save_codes_data(self, codes_data: List[Dict]):
+        """
+        追加保存验证码数据到JSONL文件（每行一条记录，无需读取已有数据）
         
-        # 保存数据
-        with open(codes_file, 'w', encoding='utf-8') as f:
-            json.dump(all_codes, f, ensure_ascii=False, indent=2)
+        Args:
+            codes_data: 验证码数据列表
+        """
+        with open(self.codes_file, 'ab') as f:
+            f.writelines(_dumps_line(code_info) for code_info in codes_data)
+        
+        print(f"💾 验证码数据已保存到: {self.codes_file}")
+    
+    def compact_codes_data(self):
+        """
+        压缩数据文件：将同步记录合并回 codes.jsonl 并清空同步记录
+        """
+        if not os.path.exists(self.codes_file):
+            return
         
-        print(f"💾 验证码数据已保存到: {codes_file}")
+        self._write_codes_file(self._iter_codes())
+        if os.path.exists(self.synced_file):
+            os.remove(self.synced_file)
     
-    def sync_codes_to_vps(self, codes_data: List[Dict] = None) -> Tuple[bool, str]:
+    def sync_codes_to_vps(self, codes_data: List[Dict] = None, sync_payload: List[Dict] = None) -> Tuple[bool, str]:
         """
         同步授权码到VPS服务器
         
         Args:
             codes_data: 要同步的验证码数据，如果为None则同步所有未同步的
+            sync_payload: 已构建好的同步数据（code/created_date），提供时不再遍历 codes_data
             
         Returns:
             Tuple[bool, str]: (成功状态, 消息)
@@ -197,17 +629,13 @@ class VPSQRCodeGenerator:
             return False, "❌ VPS地址或API密钥未配置"
         
         # 如果没有指定数据，读取所有未同步的数据
-        if codes_data is None:
-            codes_file = os.path.join(self.data_dir, "codes.json")
-            if not os.path.exists(codes_file):
+        if codes_data is None and sync_payload is None:
+            if not os.path.exists(self.codes_file):
                 return False, "❌ 没有找到验证码数据文件"
             
             try:
-                with open(codes_file, 'r', encoding='utf-8') as f:
-                    all_codes = json.load(f)
-                
                 # 筛选未同步的验证码
-                codes_data = [code for code in all_codes if not code.get('synced_to_vps', False)]
+                codes_data = [code for code in self._iter_codes() if not code.get('synced_to_vps', False)]
                 
                 if not codes_data:
                     return True, "✅ 所有验证码都已同步到VPS"
@@ -216,26 +644,35 @@ class VPSQRCodeGenerator:
                 return False, f"❌ 读取验证码数据失败: {e}"
         
         # 准备同步数据
-        sync_data = {
-            "codes": [
+        if sync_payload is None:
+            sync_payload = [
                 {
                     "code": code_info["code"],
                     "created_date": code_info["created_date"]
                 }
                 for code_info in codes_data
-            ],
+            ]
+        sync_data = {
+            "codes": sync_payload,
             "api_key": self.api_key
         }
         
         print(f"🚀 开始同步 {len(sync_data['codes'])} 个验证码到VPS...")
         
         try:
+            # 序列化请求体，较大时使用gzip压缩
+            body = _dumps(sync_data)
+            headers = self.JSON_HEADERS
+            if len(body) > self.GZIP_MIN_BYTES:
+                body = gzip.compress(body, compresslevel=1)
+                headers = self.GZIP_JSON_HEADERS
+            
             # 发送同步请求
-            response = requests.post(
+            response = self._session.post(
                 f"{self.vps_url}/api/sync-codes",
-                json=sync_data,
+                data=body,
                 timeout=30,
-                headers={'Content-Type': 'application/json'}
+                headers=headers
             )
             
             if response.status_code == 200:
@@ -261,29 +698,22 @@ class VPSQRCodeGenerator:
     
     def _mark_codes_as_synced(self, synced_codes: List[str]):
         """
-        标记验证码为已同步
+        标记验证码为已同步（追加写入同步记录，不重写验证码文件）
         
         Args:
             synced_codes: 已同步的验证码列表
         """
-        codes_file = os.path.join(self.data_dir, "codes.json")
-        if not os.path.exists(codes_file):
+        if not os.path.exists(self.codes_file):
             return
         
         try:
-            with open(codes_file, 'r', encoding='utf-8') as f:
-                all_codes = json.load(f)
-            
-            # 更新同步状态
             sync_time = datetime.now().isoformat()
-            for code_info in all_codes:
-                if code_info["code"] in synced_codes:
-                    code_info["synced_to_vps"] = True
-                    code_info["sync_date"] = sync_time
+            with open(self.synced_file, 'a', encoding='utf-8') as f:
+                f.writelines(f"{code}\t{sync_time}\n" for code in synced_codes)
             
-            # 保存更新后的数据
-            with open(codes_file, 'w', encoding='utf-8') as f:
-                json.dump(all_codes, f, ensure_ascii=False, indent=2)
+            # 同步记录过大时合并回主文件
+            if os.path.getsize(self.synced_file) > self.SYNCED_FILE_COMPACT_BYTES:
+                self.compact_codes_data()
                 
         except Exception as e:
             print(f"⚠️ 更新同步状态失败: {e}")
@@ -299,7 +729,7 @@ class VPSQRCodeGenerator:
             return False, {"error": "VPS地址未配置"}
         
         try:
-            response = requests.get(f"{self.vps_url}/api/status", timeout=10)
+            response = self._session.get(f"{self.vps_url}/api/status", timeout=10)
             
             if response.status_code == 200:
                 return True, response.json()
@@ -328,12 +758,31 @@ class VPSQRCodeGenerator:
         else:
             raise ValueError("orientation must be 'landscape' or 'portrait'")
     
+    def _qr_image_source(self, code_data: Dict):
+        """
+        获取PDF中使用的二维码图片来源：优先使用内存中的PNG数据，否则使用图片文件
+        
+        Args:
+            code_data: 验证码数据
+            
+        Returns:
+            内存PNG数据流或图片文件路径，图片不存在时返回None
+        """
+        png_data = self._qr_png_cache.get(code_data['code'])
+        if png_data is not None:
+            return io.BytesIO(png_data)
+        
+        img_path = code_data['img_path']
+        if os.path.exists(img_path):
+            return img_path
+        
+        return None
+    
     def _create_landscape_pdf(self, codes_data: List[Dict]):
         """创建横版A4 PDF文件"""
         pdf_path = os.path.join(self.output_dir, "qrcode_sheet_横版.pdf")
         
         # 创建横版A4 PDF文档
-        from reportlab.lib.pagesizes import landscape, A4
         doc = SimpleDocTemplate(
             pdf_path,
             pagesize=landscape(A4),
@@ -343,64 +792,15 @@ class VPSQRCodeGenerator:
             bottomMargin=3*cm
         )
         
-        # 注册字体
-        from reportlab.pdfbase import pdfmetrics
-        from reportlab.pdfbase.ttfonts import TTFont
-        
-        # 尝试注册字体
-        try:
-            pdfmetrics.registerFont(TTFont('Bodoni72', 'fonts/Bodoni 72.ttc'))
-            title_font = 'Bodoni72'
-        except:
-            try:
-                pdfmetrics.registerFont(TTFont('BrushScript', '/System/Library/Fonts/Supplemental/Brush Script.ttf'))
-                title_font = 'BrushScript'
-            except:
-                try:
-                    pdfmetrics.registerFont(TTFont('Baskerville', '/System/Library/Fonts/Baskerville.ttc'))
-                    title_font = 'Baskerville'
-                except:
-                    title_font = 'Times-Roman'
-        
-        try:
-            pdfmetrics.registerFont(TTFont('PTSerif', '/System/Library/Fonts/Supplemental/PTSerif.ttc'))
-            code_font = 'PTSerif'
-        except:
-            try:
-                pdfmetrics.registerFont(TTFont('Monaco', '/System/Library/Fonts/Monaco.ttf'))
-                code_font = 'Monaco'
-            except:
-                code_font = 'Courier-Bold'
-        
-        # 样式
-        styles = getSampleStyleSheet()
-        
-        title_style = ParagraphStyle(
-            'CustomTitle',
-            parent=styles['Normal'],
-            fontName=title_font,
-            fontSize=24,
-            spaceAfter=40,
-            alignment=TA_CENTER,
-            textColor=colors.black
-        )
-        
-        code_style = ParagraphStyle(
-            'CodeStyle',
-            parent=styles['Normal'],
-            fontName=code_font,
-            fontSize=18,
-            spaceBefore=20,
-            alignment=TA_CENTER,
-            textColor=colors.black
-        )
+        # 字体与样式（进程内只注册/构建一次）
+        title_font, code_font = _register_fonts("landscape")
+        title_style, code_style = _pdf_styles("landscape")
         
         story = []
         
         # 为每个验证码创建一页
         for i, code_data in enumerate(codes_data):
             if i > 0:
-                from reportlab.platypus import PageBreak
                 story.append(PageBreak())
             
             story.append(Spacer(1, 2*cm))
@@ -411,10 +811,9 @@ class VPSQRCodeGenerator:
             story.append(title)
             
             # 二维码图片
-            img_path = code_data['img_path']
-            if os.path.exists(img_path):
-                from reportlab.platypus import Image
-                qr_img = Image(img_path, width=6*cm, height=6*cm)
+            img_source = self._qr_image_source(code_data)
+            if img_source is not None:
+                qr_img = Image(img_source, width=6*cm, height=6*cm)
                 qr_img.hAlign = 'CENTER'
                 story.append(qr_img)
             
@@ -441,51 +840,14 @@ class VPSQRCodeGenerator:
             bottomMargin=2.5*cm
         )
         
-        # 字体配置（与横版相同）
-        from reportlab.pdfbase import pdfmetrics
-        from reportlab.pdfbase.ttfonts import TTFont
-        
-        try:
-            pdfmetrics.registerFont(TTFont('Bodoni72', 'fonts/Bodoni 72.ttc'))
-            title_font = 'Bodoni72'
-        except:
-            title_font = 'Times-Roman'
-        
-        try:
-            pdfmetrics.registerFont(TTFont('PTSerif', '/System/Library/Fonts/Supplemental/PTSerif.ttc'))
-            code_font = 'PTSerif'
-        except:
-            code_font = 'Courier-Bold'
-        
-        styles = getSampleStyleSheet()
-        
-        title_style = ParagraphStyle(
-            'PortraitTitle',
-            parent=styles['Normal'],
-            fontName=title_font,
-            fontSize=20,
-            spaceAfter=30,
-            alignment=TA_CENTER,
-            textColor=colors.black,
-            leading=24
-        )
-        
-        code_style = ParagraphStyle(
-            'PortraitCode',
-            parent=styles['Normal'],
-            fontName=code_font,
-            fontSize=16,
-            spaceBefore=15,
-            alignment=TA_CENTER,
-            textColor=colors.black,
-            leading=20
-        )
+        # 字体与样式（进程内只注册/构建一次）
+        title_font, code_font = _register_fonts("portrait")
+        title_style, code_style = _pdf_styles("portrait")
         
         story = []
         
         for i, code_data in enumerate(codes_data):
             if i > 0:
-                from reportlab.platypus import PageBreak
                 story.append(PageBreak())
             
             story.append(Spacer(1, 4*cm))
@@ -496,11 +858,10 @@ class VPSQRCodeGenerator:
             
             story.append(Spacer(1, 1.5*cm))
             
-            img_path = code_data['img_path']
-            if os.path.exists(img_path):
-                from reportlab.platypus import Image
+            img_source = self._qr_image_source(code_data)
+            if img_source is not None:
                 qr_size = 7*cm
-                qr_img = Image(img_path, width=qr_size, height=qr_size)
+                qr_img = Image(img_source, width=qr_size, height=qr_size)
                 qr_img.hAlign = 'CENTER'
                 story.append(qr_img)
             
@@ -542,7 +903,7 @@ class VPSQRCodeGenerator:
                 auto_sync = False
         
         # 生成验证码数据
-        codes_data = self.generate_codes_data(count)
+        codes_data, sync_payload = self._generate_codes(count)
         
         # 保存数据
         self.save_codes_data(codes_data)
@@ -553,14 +914,14 @@ class VPSQRCodeGenerator:
         # 同步到VPS
         if auto_sync:
             print("\n🚀 正在同步到VPS服务器...")
-            sync_ok, sync_msg = self.sync_codes_to_vps(codes_data)
+            sync_ok, sync_msg = self.sync_codes_to_vps(codes_data, sync_payload)
             print(sync_msg)
         
         print(f"\n✅ 批量生成完成！")
         print(f"📁 二维码图片目录: {self.qrcode_dir}")
         pdf_filename = f"qrcode_sheet_{orientation_text}.pdf"
         print(f"📄 PDF文件: {os.path.join(self.output_dir, pdf_filename)}")
-        print(f"💾 数据文件: {os.path.join(self.data_dir, 'codes.json')}")
+        print(f"💾 数据文件: {self.codes_file}")
         if auto_sync and sync_ok:
             print(f"🌐 已同步到VPS: {self.vps_url}")
         
@@ -5,25 +5,34 @@
 功能：授权码管理、验证服务、状态跟踪
 """
 
-from flask import Flask, request, jsonify, render_template_string, render_template, redirect, url_for, session, flash, Response
+from flask import Flask, request, jsonify, render_template, redirect, url_for, session, flash, Response
 from flask_cors import CORS
 import sqlite3
-import hashlib
 import hmac
 import json
-from datetime import datetime
+from datetime import datetime, timedelta
 import os
 import logging
 from typing import Dict, List, Optional, Tuple
 import ipaddress
 import secrets
-import string
-import csv
-import io
+import zlib
+import threading
+import time
+import functools
+import platform
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
 
 # 导入配置和模型
-from config import Config
-from models import init_db, AuthCode
+from config import Config, generate_api_key
+from models import (
+    init_db, configure_connection, SQLiteConnectionPool, AuthCode,
+    CACHED_STATEMENTS, SQL_INSERT_CODE, SQL_INSERT_CODE_OR_IGNORE
+)
 
 # 配置日志
 logging.basicConfig(
@@ -39,46 +48,92 @@ logger = logging.getLogger(__name__)
 # 创建Flask应用
 # 检查模板目录是否存在
 template_dir = os.path.join(os.path.dirname(__file__), 'templates')
-if not os.path.exists(template_dir):
-    os.makedirs(template_dir, exist_ok=True)
+os.makedirs(template_dir, exist_ok=True)
 
 app = Flask(__name__, template_folder='templates')
 app.config.from_object(Config)
+# 仅在调试模式下检查模板文件变化，生产环境渲染模板时不再 stat 模板文件
+app.config['TEMPLATES_AUTO_RELOAD'] = Config.DEBUG
 CORS(app)  # 允许跨域请求
 
 # 管理后台配置
 app.config['ADMIN_USERNAME'] = os.environ.get('ADMIN_USERNAME', 'admin')
 app.config['ADMIN_PASSWORD'] = os.environ.get('ADMIN_PASSWORD', 'musicqr2024')
 
-# 初始化数据库
-init_db()
+# 初始化数据库（与授权码管理器使用同一个数据库文件）
+init_db(Config.DATABASE_PATH)
 
 class AuthCodeManager:
     """授权码管理器"""
     
     def __init__(self):
         self.db_path = Config.DATABASE_PATH
+        # 内存数据库的每个连接都是独立的库，不能池化，改为每个线程保留一个连接
+        if self.db_path == ':memory:':
+            self.pool = None
+        else:
+            self.pool = SQLiteConnectionPool(self.db_path, Config.DB_POOL_SIZE, row_factory=sqlite3.Row)
+        # 预期的API密钥只依赖配置，启动时计算一次
+        self._expected_api_key = generate_api_key(Config.SECRET_KEY, Config.API_KEY_SALT).encode()
+        # 当前线程正在处理的请求所借用的连接
+        self._local = threading.local()
+        # 统计信息缓存：(过期时间, 统计结果)
+        self._stats_cache = (0.0, None)
+        self._stats_lock = threading.Lock()
+        # 数据版本号：每次写入授权码后递增，用于使查询结果缓存失效
+        self._data_version = 0
+        # 最近添加的授权码缓存：(数据版本号, 过期时间, 结果)
+        self._recent_cache = (-1, 0.0, None)
     
     def get_db_connection(self) -> sqlite3.Connection:
-        """获取数据库连接"""
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
+        """获取当前请求的数据库连接（首次调用时从连接池借出，请求内复用）"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            if self.pool is not None:
+                conn = self.pool.get()
+            else:
+                conn = configure_connection(sqlite3.connect(self.db_path, cached_statements=CACHED_STATEMENTS))
+                conn.row_factory = sqlite3.Row
+            self._local.conn = conn
         return conn
     
+    def release_connection(self):
+        """请求结束时调用：将连接归还连接池（未提交的事务会被回滚）"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            return
+        if self.pool is None:
+            # 内存数据库连接保留在线程上
+            if conn.in_transaction:
+                conn.rollback()
+            return
+        self._local.conn = None
+        self.pool.put(conn)
+    
+    def detach_connection(self) -> sqlite3.Connection:
+        """取出当前请求的连接并解除与请求的绑定，由调用方负责用 return_connection 归还
+        
+        用于流式响应：请求拆除时连接仍在被生成器使用。
+        """
+        conn = self.get_db_connection()
+        if self.pool is not None:
+            self._local.conn = None
+        return conn
+    
+    def return_connection(self, conn: sqlite3.Connection):
+        """归还通过 detach_connection 取出的连接"""
+        if self.pool is not None:
+            self.pool.put(conn)
+        elif conn.in_transaction:
+            conn.rollback()
+    
     def verify_api_key(self, api_key: str) -> bool:
         """验证API密钥"""
-        if not api_key:
+        if not api_key or not isinstance(api_key, str):
             return False
 
-        # 生成预期的API密钥
-        expected = hmac.new(
-            Config.SECRET_KEY.encode(),
-            Config.API_KEY_SALT.encode(),
-            hashlib.sha256
-        ).hexdigest()
-
-        # 直接比较提供的API密钥和预期的API密钥
-        return hmac.compare_digest(expected, api_key)
+        # 以字节串进行常量时间比较（非ASCII输入也不会抛出异常）
+        return hmac.compare_digest(self._expected_api_key, api_key.encode())
     
     def sync_codes(self, codes_data: List[Dict], api_key: str) -> Tuple[bool, str, Dict]:
         """
@@ -101,34 +156,28 @@ class AuthCodeManager:
         conn = self.get_db_connection()
         cursor = conn.cursor()
         
-        added_count = 0
-        skipped_count = 0
         error_count = 0
         
         try:
+            now = datetime.now().isoformat()
+            rows = []
             for code_info in codes_data:
                 code = code_info.get('code', '').strip().upper()
-                created_date = code_info.get('created_date')
                 
                 if not code or len(code) != 12:
                     error_count += 1
                     continue
                 
-                # 检查是否已存在
-                cursor.execute("SELECT id FROM auth_codes WHERE code = ?", (code,))
-                if cursor.fetchone():
-                    skipped_count += 1
-                    continue
-                
-                # 插入新授权码
-                cursor.execute("""
-                    INSERT INTO auth_codes (code, created_date, activated, query_count)
-                    VALUES (?, ?, FALSE, 0)
-                """, (code, created_date or datetime.now().isoformat()))
-                
-                added_count += 1
+                rows.append((code, code_info.get('created_date') or now))
+            
+            # code 列有唯一约束，已存在的授权码由 INSERT OR IGNORE 跳过，无需逐条查询
+            cursor.executemany(SQL_INSERT_CODE_OR_IGNORE, rows)
+            
+            added_count = max(cursor.rowcount, 0)
+            skipped_count = len(rows) - added_count
             
             conn.commit()
+            self.invalidate_stats()
             
             stats = {
                 'added': added_count,
@@ -145,8 +194,6 @@ class AuthCodeManager:
             logger.error(f"同步授权码失败: {e}")
             return False, f"数据库错误: {str(e)}", {}
         
-        finally:
-            conn.close()
     
     def verify_code(self, code: str, client_ip: str = None, user_agent: str = None) -> Tuple[bool, Dict]:
         """
@@ -205,6 +252,7 @@ class AuthCodeManager:
                 """, (now, client_ip, user_agent, new_query_count, now, result['id']))
                 
                 conn.commit()
+                self.invalidate_stats()
                 
                 logger.info(f"授权码首次激活: {code} from {client_ip}")
                 
@@ -241,30 +289,82 @@ class AuthCodeManager:
                 'activated': False
             }
         
-        finally:
-            conn.close()
+    
+    def invalidate_stats(self):
+        """使统计信息及查询结果缓存失效（授权码新增、激活或删除后调用）"""
+        self._stats_cache = (0.0, None)
+        self._data_version += 1
+    
+    def get_recent_codes(self, limit: int = 10) -> List[sqlite3.Row]:
+        """
+        获取最近添加的授权码
+        
+        结果在数据未变化时最多缓存 Config.STATS_TTL 秒
+        
+        Args:
+            limit: 返回数量
+            
+        Returns:
+            List[sqlite3.Row]: 授权码列表（code、created_date、activated），按创建时间倒序
+        """
+        version = self._data_version
+        cached_version, expiry, codes = self._recent_cache
+        if (codes is not None and cached_version == version
+                and len(codes) >= limit and time.monotonic() < expiry):
+            return codes[:limit]
+        
+        conn = self.get_db_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute("""
+                SELECT code, created_date, activated FROM auth_codes
+                ORDER BY created_date DESC
+                LIMIT ?
+            """, (limit,))
+            codes = cursor.fetchall()
+        except Exception as e:
+            logger.error(f"获取最近授权码失败: {e}")
+            return []
+        
+        self._recent_cache = (version, time.monotonic() + Config.STATS_TTL, codes)
+        return codes
     
     def get_stats(self) -> Dict:
-        """获取系统统计信息"""
+        """获取系统统计信息（在 Config.STATS_TTL 秒内复用上次结果）"""
+        expiry, stats = self._stats_cache
+        if stats is not None and time.monotonic() < expiry:
+            return stats
+        
+        # 加锁后再检查一次，缓存过期时只由一个请求查询数据库
+        with self._stats_lock:
+            expiry, stats = self._stats_cache
+            if stats is not None and time.monotonic() < expiry:
+                return stats
+            
+            stats = self._query_stats()
+            if stats:
+                self._stats_cache = (time.monotonic() + Config.STATS_TTL, stats)
+            return stats
+    
+    def _query_stats(self) -> Dict:
+        """从数据库查询统计信息"""
         conn = self.get_db_connection()
         cursor = conn.cursor()
         
         try:
-            # 总授权码数量
-            cursor.execute("SELECT COUNT(*) as total FROM auth_codes")
-            total = cursor.fetchone()['total']
-            
-            # 已激活数量
-            cursor.execute("SELECT COUNT(*) as activated FROM auth_codes WHERE activated = TRUE")
-            activated = cursor.fetchone()['activated']
+            # 总授权码数量和已激活数量（由触发器维护的计数表）
+            cursor.execute("SELECT name, value FROM auth_counts")
+            counts = dict(cursor.fetchall())
+            total = counts.get('total', 0)
+            activated = counts.get('activated', 0)
             
-            # 今日查询数量
-            today = datetime.now().date().isoformat()
+            # 今日查询数量（按时间范围比较，可直接使用 last_query_date 索引）
+            today = datetime.now().date()
             cursor.execute("""
                 SELECT COUNT(*) as today_queries 
                 FROM auth_codes 
-                WHERE DATE(last_query_date) = ?
-            """, (today,))
+                WHERE last_query_date >= ? AND last_query_date < ?
+            """, (today.isoformat(), (today + timedelta(days=1)).isoformat()))
             today_queries = cursor.fetchone()['today_queries']
             
             return {
@@ -278,89 +378,112 @@ class AuthCodeManager:
             logger.error(f"获取统计信息失败: {e}")
             return {}
         
-        finally:
-            conn.close()
 
 # 创建授权码管理器实例
 auth_manager = AuthCodeManager()
+app.extensions['sqlite_pool'] = auth_manager.pool
+
+@app.teardown_request
+def release_db_connection(exception=None):
+    """请求结束后归还数据库连接"""
+    auth_manager.release_connection()
+
+def get_request_json() -> Optional[Dict]:
+    """读取请求JSON，支持 Content-Encoding: gzip 压缩的请求体"""
+    if request.content_encoding != 'gzip':
+        return request.get_json()
+    
+    # 限制解压后的大小，防止压缩炸弹绕过 MAX_CONTENT_LENGTH
+    max_size = app.config['MAX_CONTENT_LENGTH']
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    body = decompressor.decompress(request.get_data(), max_size)
+    if decompressor.unconsumed_tail:
+        raise ValueError('请求数据过大')
+    
+    return json.loads(body)
+
+# 授权码字母表（排除容易混淆的字符），共32个字符，正好对应一个字节的低5位
+CODE_ALPHABET = b'ABCDEFGHJKLMNPQRSTUVWXYZ23456789'
+# 随机字节 -> 字母表字符的映射表（按低5位映射，256可被32整除，无偏差），供 bytes.translate 使用
+CODE_TRANSLATION = CODE_ALPHABET * 8
+
+def generate_auth_code(length: int = 12) -> str:
+    """
+    生成随机授权码（一次取出全部随机字节，按低5位映射到字母表，无取模偏差）
+    
+    Args:
+        length: 授权码长度
+        
+    Returns:
+        str: 授权码
+    """
+    return secrets.token_bytes(length).translate(CODE_TRANSLATION).decode('ascii')
+
+def generate_auth_codes(count: int, length: int = 12) -> set:
+    """
+    批量生成随机授权码（一次取出全部随机字节后切分）
+    
+    Args:
+        count: 生成数量（结果已去重，可能略少于该数量）
+        length: 授权码长度
+        
+    Returns:
+        set: 授权码集合
+    """
+    chars = secrets.token_bytes(count * length).translate(CODE_TRANSLATION).decode('ascii')
+    return {chars[i:i + length] for i in range(0, len(chars), length)}
+
+# IN 子句每条语句的参数个数上限（旧版 SQLite 限制为 999 个参数）
+SQL_IN_CHUNK_SIZE = 500
+
+def chunked(items: List[str], size: int = SQL_IN_CHUNK_SIZE):
+    """
+    按固定大小切分列表，用于拆分 IN 子句的参数
+    
+    Args:
+        items: 待切分的列表
+        size: 每块的最大长度
+        
+    Returns:
+        Iterator[List[str]]: 依次返回各块
+    """
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+def in_clause_queries(sql: str, codes: List[str]) -> List[Tuple[str, List[str]]]:
+    """
+    为 "... IN ({})" 形式的语句按块生成 (SQL, 参数) 列表（重复的授权码只保留一个）
+    
+    除最后一块外各块长度相同，语句文本相同，可复用已编译的语句
+    
+    Args:
+        sql: 含一个 {} 占位的 SQL，{} 处填入占位符列表
+        codes: 授权码列表
+        
+    Returns:
+        List[Tuple[str, List[str]]]: 依次执行的语句及其参数
+    """
+    codes = list(dict.fromkeys(codes))
+    return [(sql.format(','.join('?' * len(chunk))), chunk) for chunk in chunked(codes)]
 
 def get_client_ip() -> str:
     """获取客户端真实IP"""
-    # 检查代理头
-    if request.headers.get('X-Forwarded-For'):
-        return request.headers.get('X-Forwarded-For').split(',')[0].strip()
-    elif request.headers.get('X-Real-IP'):
-        return request.headers.get('X-Real-IP')
-    else:
-        return request.remote_addr
+    headers = request.headers
+    
+    # 检查代理头（每个请求头只查找一次，只截取第一个地址）
+    forwarded_for = headers.get('X-Forwarded-For')
+    if forwarded_for:
+        return forwarded_for.partition(',')[0].strip()
+    return headers.get('X-Real-IP') or request.remote_addr
 
 @app.route('/')
 def index():
     """首页 - 显示系统状态"""
     stats = auth_manager.get_stats()
     
-    html_template = """
-    <!DOCTYPE html>
-    <html lang="zh-CN">
-    <head>
-        <meta charset="UTF-8">
-        <meta name="viewport" content="width=device-width, initial-scale=1.0">
-        <title>乐谱验证系统 - API服务</title>
-        <style>
-            body { font-family: Georgia, serif; margin: 40px; background: #f8f8f8; }
-            .container { max-width: 600px; margin: 0 auto; background: white; padding: 40px; border: 1px solid #ddd; }
-            h1 { color: #333; text-align: center; margin-bottom: 30px; }
-            .stats { display: grid; grid-template-columns: 1fr 1fr; gap: 20px; margin: 30px 0; }
-            .stat-item { text-align: center; padding: 20px; background: #f8f8f8; border: 1px solid #eee; }
-            .stat-number { font-size: 2em; font-weight: bold; color: #333; }
-            .stat-label { color: #666; margin-top: 5px; }
-            .api-info { margin-top: 30px; padding: 20px; background: #f0f0f0; border-left: 4px solid #333; }
-            .footer { text-align: center; margin-top: 30px; color: #666; font-size: 0.9em; }
-        </style>
-    </head>
-    <body>
-        <div class="container">
-            <h1>🎵 乐谱验证系统</h1>
-            <p style="text-align: center; color: #666;">API服务运行中</p>
-            
-            <div class="stats">
-                <div class="stat-item">
-                    <div class="stat-number">{{ stats.total_codes or 0 }}</div>
-                    <div class="stat-label">总授权码</div>
-                </div>
-                <div class="stat-item">
-                    <div class="stat-number">{{ stats.activated_codes or 0 }}</div>
-                    <div class="stat-label">已激活</div>
-                </div>
-                <div class="stat-item">
-                    <div class="stat-number">{{ stats.activation_rate or 0 }}%</div>
-                    <div class="stat-label">激活率</div>
-                </div>
-                <div class="stat-item">
-                    <div class="stat-number">{{ stats.today_queries or 0 }}</div>
-                    <div class="stat-label">今日查询</div>
-                </div>
-            </div>
-            
-            <div class="api-info">
-                <h3>API端点</h3>
-                <p><strong>验证授权码:</strong> GET /api/verify/{code}</p>
-                <p><strong>同步授权码:</strong> POST /api/sync-codes</p>
-                <p><strong>系统状态:</strong> GET /api/status</p>
-            </div>
-            
-            <div class="footer">
-                <p>乐谱验证系统 v2.0 - Yuze Pan</p>
-                <p>服务时间: {{ current_time }}</p>
-            </div>
-        </div>
-    </body>
-    </html>
-    """
-    
-    return render_template_string(html_template, 
-                                stats=stats, 
-                                current_time=datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
+    return render_template('index.html',
+                         stats=stats,
+                         current_time=datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
 
 @app.route('/api/verify/<code>')
 def verify_code_api(code):
@@ -379,7 +502,10 @@ def verify_code_api(code):
 def sync_codes_api():
     """同步授权码API"""
     try:
-        data = request.get_json()
+        try:
+            data = get_request_json()
+        except (zlib.error, ValueError):
+            data = None
         
         if not data:
             return jsonify({'error': '无效的请求数据'}), 400
@@ -481,18 +607,18 @@ def admin_dashboard():
             ORDER BY activation_date DESC
             LIMIT 10
         """)
-        recent_activations = [dict(row) for row in cursor.fetchall()]
+        recent_activations = cursor.fetchall()
 
-        # 获取7天激活趋势
+        # 获取7天激活趋势（起始日期按本地时间计算，与 activation_date 的存储一致）
         cursor.execute("""
             SELECT DATE(activation_date) as date, COUNT(*) as count
             FROM auth_codes
             WHERE activated = TRUE
-            AND activation_date >= DATE('now', '-7 days')
+            AND activation_date >= ?
             GROUP BY DATE(activation_date)
             ORDER BY date
-        """)
-        daily_stats = [dict(row) for row in cursor.fetchall()]
+        """, ((datetime.now().date() - timedelta(days=7)).isoformat(),))
+        daily_stats = cursor.fetchall()
         max_daily_count = max([d['count'] for d in daily_stats]) if daily_stats else 0
 
         # 数据库大小
@@ -504,8 +630,6 @@ def admin_dashboard():
         daily_stats = []
         max_daily_count = 0
         db_size_mb = 0
-    finally:
-        conn.close()
 
     return render_template('admin_dashboard.html',
                          stats=stats,
@@ -515,6 +639,32 @@ def admin_dashboard():
                          db_size_mb=db_size_mb,
                          current_time=datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
 
+# 授权码列表页面用到的列（id 用于游标分页）
+CODE_LIST_COLUMNS = 'id, code, created_date, activated, activation_date, query_count, last_query_date'
+
+# 分页相关的查询参数
+PAGINATION_ARGS = ('page', 'after_created', 'after_id', 'before_created', 'before_id')
+
+class Pagination:
+    """授权码列表分页信息（页码分页时提供页码链接，游标分页时只有上一页/下一页）"""
+
+    def __init__(self, base_args: Dict, page: int = None, pages: int = 0,
+                 prev_args: Dict = None, next_args: Dict = None):
+        self.page = page
+        self.pages = pages
+        self.base_args = base_args
+        self.has_prev = prev_args is not None
+        self.has_next = next_args is not None
+        self.prev_args = dict(base_args, **prev_args) if prev_args else None
+        self.next_args = dict(base_args, **next_args) if next_args else None
+
+    def iter_pages(self):
+        """当前页附近的页码及其链接参数"""
+        if self.page is None:
+            return
+        for num in range(max(1, self.page - 2), min(self.pages + 1, self.page + 3)):
+            yield num, dict(self.base_args, page=num)
+
 @app.route('/admin/codes')
 @admin_required
 def admin_codes():
@@ -553,44 +703,82 @@ def admin_codes():
         }
         order_clause = f" ORDER BY {sort_mapping.get(sort, 'created_date DESC')}"
 
-        # 获取总数
-        cursor.execute(f"SELECT COUNT(*) FROM auth_codes{where_clause}", params)
-        total_count = cursor.fetchone()[0]
-
-        # 获取已激活数量
-        activated_params = params.copy()
-        activated_where = where_conditions.copy()
-        activated_where.append("activated = TRUE")
-        activated_where_clause = " WHERE " + " AND ".join(activated_where)
-        cursor.execute(f"SELECT COUNT(*) FROM auth_codes{activated_where_clause}", activated_params)
-        activated_count = cursor.fetchone()[0]
-
-        # 分页查询
-        offset = (page - 1) * per_page
-        cursor.execute(f"""
-            SELECT * FROM auth_codes{where_clause}{order_clause}
-            LIMIT ? OFFSET ?
-        """, params + [per_page, offset])
-
-        codes = [dict(row) for row in cursor.fetchall()]
-
-        # 简单分页对象
-        class Pagination:
-            def __init__(self, page, per_page, total):
-                self.page = page
-                self.per_page = per_page
-                self.total = total
-                self.pages = (total + per_page - 1) // per_page
-                self.has_prev = page > 1
-                self.has_next = page < self.pages
-                self.prev_num = page - 1 if self.has_prev else None
-                self.next_num = page + 1 if self.has_next else None
-
-            def iter_pages(self):
-                for num in range(max(1, self.page - 2), min(self.pages + 1, self.page + 3)):
-                    yield num
-
-        pagination = Pagination(page, per_page, total_count)
+        # 一次查询同时获取总数和已激活数量
+        if status == 'activated':
+            cursor.execute(f"SELECT COUNT(*) FROM auth_codes{where_clause}", params)
+            total_count = activated_count = cursor.fetchone()[0]
+        else:
+            cursor.execute(f"""
+                SELECT COUNT(*), SUM(CASE WHEN activated THEN 1 ELSE 0 END)
+                FROM auth_codes{where_clause}
+            """, params)
+            total_count, activated_count = cursor.fetchone()
+            activated_count = activated_count or 0
+
+        # 翻页链接保留筛选和排序参数，去掉旧的页码/游标参数
+        base_args = {k: v for k, v in request.args.items() if k not in PAGINATION_ARGS}
+
+        if sort == 'created_desc':
+            # 默认排序使用游标分页：按 (created_date, id) 定位，走索引范围扫描，无需 OFFSET 跳过前面的行
+            after_created = request.args.get('after_created')
+            after_id = request.args.get('after_id', type=int)
+            before_created = request.args.get('before_created')
+            before_id = request.args.get('before_id', type=int)
+
+            keyset_conditions = where_conditions.copy()
+            keyset_params = params.copy()
+            backward = before_created is not None and before_id is not None
+            if backward:
+                keyset_conditions.append("(created_date, id) > (?, ?)")
+                keyset_params += [before_created, before_id]
+                keyset_order = " ORDER BY created_date ASC, id ASC"
+            else:
+                if after_created is not None and after_id is not None:
+                    keyset_conditions.append("(created_date, id) < (?, ?)")
+                    keyset_params += [after_created, after_id]
+                keyset_order = " ORDER BY created_date DESC, id DESC"
+            keyset_where = " WHERE " + " AND ".join(keyset_conditions) if keyset_conditions else ""
+
+            # 多取一行用于判断前方是否还有数据
+            cursor.execute(f"""
+                SELECT {CODE_LIST_COLUMNS} FROM auth_codes{keyset_where}{keyset_order}
+                LIMIT ?
+            """, keyset_params + [per_page + 1])
+
+            codes = cursor.fetchall()
+            has_more = len(codes) > per_page
+            del codes[per_page:]
+            if backward:
+                codes.reverse()
+                has_prev, has_next = has_more, True
+            else:
+                has_prev, has_next = after_created is not None and after_id is not None, has_more
+
+            pagination = Pagination(
+                base_args,
+                prev_args={'before_created': codes[0]['created_date'], 'before_id': codes[0]['id']}
+                if codes and has_prev else None,
+                next_args={'after_created': codes[-1]['created_date'], 'after_id': codes[-1]['id']}
+                if codes and has_next else None
+            )
+        else:
+            # 分页查询
+            offset = (page - 1) * per_page
+            cursor.execute(f"""
+                SELECT {CODE_LIST_COLUMNS} FROM auth_codes{where_clause}{order_clause}
+                LIMIT ? OFFSET ?
+            """, params + [per_page, offset])
+
+            codes = cursor.fetchall()
+
+            pages = (total_count + per_page - 1) // per_page
+            pagination = Pagination(
+                base_args,
+                page=page,
+                pages=pages,
+                prev_args={'page': page - 1} if page > 1 else None,
+                next_args={'page': page + 1} if page < pages else None
+            )
 
     except Exception as e:
         logger.error(f"获取授权码列表失败: {e}")
@@ -598,8 +786,6 @@ def admin_codes():
         pagination = None
         total_count = 0
         activated_count = 0
-    finally:
-        conn.close()
 
     return render_template('admin_codes.html',
                          codes=codes,
@@ -619,10 +805,7 @@ def admin_add_code():
             code = request.form.get('code', '').strip().upper()
             if not code:
                 # 自动生成
-                import secrets
-                import string
-                alphabet = 'ABCDEFGHJKLMNPQRSTUVWXYZ23456789'  # 排除容易混淆的字符
-                code = ''.join(secrets.choice(alphabet) for _ in range(12))
+                code = generate_auth_code()
 
             if len(code) != 12:
                 flash('授权码长度必须为12位', 'error')
@@ -630,18 +813,14 @@ def admin_add_code():
                 conn = auth_manager.get_db_connection()
                 cursor = conn.cursor()
                 try:
-                    cursor.execute("""
-                        INSERT INTO auth_codes (code, created_date, activated, query_count)
-                        VALUES (?, ?, FALSE, 0)
-                    """, (code, datetime.now().isoformat()))
+                    cursor.execute(SQL_INSERT_CODE, (code, datetime.now().isoformat()))
                     conn.commit()
+                    auth_manager.invalidate_stats()
                     flash(f'成功添加授权码: {code}', 'success')
                 except sqlite3.IntegrityError:
                     flash(f'授权码 {code} 已存在', 'error')
                 except Exception as e:
                     flash(f'添加失败: {str(e)}', 'error')
-                finally:
-                    conn.close()
 
         elif action == 'batch':
             # 批量添加
@@ -652,40 +831,25 @@ def admin_add_code():
                 conn = auth_manager.get_db_connection()
                 cursor = conn.cursor()
 
-                # 获取现有授权码以避免重复
-                cursor.execute("SELECT code FROM auth_codes")
-                existing_codes = {row[0] for row in cursor.fetchall()}
-
-                import secrets
-                import string
-                alphabet = 'ABCDEFGHJKLMNPQRSTUVWXYZ23456789'
-
+                now_iso = datetime.now().isoformat()
                 added_count = 0
-                for _ in range(count):
-                    # 生成唯一授权码
-                    attempts = 0
-                    while attempts < 100:  # 最多尝试100次
-                        code = ''.join(secrets.choice(alphabet) for _ in range(12))
-                        if code not in existing_codes:
-                            break
-                        attempts += 1
+                attempts = 0
 
-                    if attempts >= 100:
-                        break
-
-                    try:
-                        cursor.execute("""
-                            INSERT INTO auth_codes (code, created_date, activated, query_count)
-                            VALUES (?, ?, FALSE, 0)
-                        """, (code, datetime.now().isoformat()))
-                        existing_codes.add(code)
-                        added_count += 1
-                    except Exception:
-                        continue
+                # 依赖 code 唯一约束去重：与已有授权码冲突的候选码被忽略，只为不足的部分重新生成
+                try:
+                    while added_count < count and attempts < 100:  # 最多尝试100轮
+                        rows = [(code, now_iso) for code in generate_auth_codes(count - added_count)]
+                        cursor.executemany(SQL_INSERT_CODE_OR_IGNORE, rows)
+                        added_count += max(cursor.rowcount, 0)
+                        attempts += 1
 
-                conn.commit()
-                conn.close()
-                flash(f'成功生成 {added_count} 个授权码', 'success')
+                    # 整批只提交一次
+                    conn.commit()
+                    auth_manager.invalidate_stats()
+                    flash(f'成功生成 {added_count} 个授权码', 'success')
+                except Exception as e:
+                    conn.rollback()
+                    flash(f'生成失败: {str(e)}', 'error')
 
         elif action == 'import':
             # 导入授权码
@@ -699,41 +863,43 @@ def admin_add_code():
                 conn = auth_manager.get_db_connection()
                 cursor = conn.cursor()
 
-                added_count = 0
-                skipped_count = 0
                 error_count = 0
+                rows = []
+                # 未指定创建时间的授权码统一使用导入时间
+                now_iso = datetime.now().isoformat()
 
                 for line in lines:
                     if ',' in line:
                         # CSV格式
                         parts = line.split(',', 1)
                         code = parts[0].strip().upper()
-                        created_date = parts[1].strip() if len(parts) > 1 else datetime.now().isoformat()
+                        created_date = parts[1].strip() if len(parts) > 1 else now_iso
                     else:
                         # 纯文本格式
                         code = line.upper()
-                        created_date = datetime.now().isoformat()
+                        created_date = now_iso
 
                     if len(code) != 12:
                         error_count += 1
                         continue
 
-                    try:
-                        cursor.execute("""
-                            INSERT INTO auth_codes (code, created_date, activated, query_count)
-                            VALUES (?, ?, FALSE, 0)
-                        """, (code, created_date))
-                        added_count += 1
-                    except sqlite3.IntegrityError:
-                        if skip_duplicates:
-                            skipped_count += 1
-                        else:
-                            error_count += 1
-                    except Exception:
-                        error_count += 1
+                    rows.append((code, created_date))
 
-                conn.commit()
-                conn.close()
+                # 整批写入并只提交一次；已存在的授权码由唯一约束忽略，按选项计为跳过或错误
+                added_count = 0
+                skipped_count = 0
+                try:
+                    with conn:
+                        cursor.executemany(SQL_INSERT_CODE_OR_IGNORE, rows)
+                    added_count = max(cursor.rowcount, 0)
+                    duplicate_count = len(rows) - added_count
+                    if skip_duplicates:
+                        skipped_count = duplicate_count
+                    else:
+                        error_count += duplicate_count
+                    auth_manager.invalidate_stats()
+                except Exception:
+                    error_count += len(rows)
 
                 message = f'导入完成: 添加 {added_count} 个'
                 if skipped_count > 0:
@@ -744,19 +910,7 @@ def admin_add_code():
                 flash(message, 'success' if added_count > 0 else 'info')
 
     # 获取最近添加的授权码
-    conn = auth_manager.get_db_connection()
-    cursor = conn.cursor()
-    try:
-        cursor.execute("""
-            SELECT * FROM auth_codes
-            ORDER BY created_date DESC
-            LIMIT 10
-        """)
-        recent_codes = [dict(row) for row in cursor.fetchall()]
-    except Exception:
-        recent_codes = []
-    finally:
-        conn.close()
+    recent_codes = auth_manager.get_recent_codes(10)
 
     return render_template('admin_add_code.html', recent_codes=recent_codes)
 
@@ -768,20 +922,20 @@ def admin_code_detail(code):
     cursor = conn.cursor()
 
     try:
-        cursor.execute("SELECT * FROM auth_codes WHERE code = ?", (code,))
+        cursor.execute("""
+            SELECT code, created_date, activated, activation_date, activation_ip,
+                   activation_user_agent, query_count, last_query_date
+            FROM auth_codes WHERE code = ?
+        """, (code,))
         code_info = cursor.fetchone()
 
         if not code_info:
             flash('授权码不存在', 'error')
             return redirect(url_for('admin_codes'))
 
-        code_info = dict(code_info)
-
     except Exception as e:
         flash(f'获取授权码信息失败: {str(e)}', 'error')
         return redirect(url_for('admin_codes'))
-    finally:
-        conn.close()
 
     return render_template('admin_code_detail.html', code_info=code_info)
 
@@ -796,122 +950,167 @@ def admin_delete_code(code):
         cursor.execute("DELETE FROM auth_codes WHERE code = ?", (code,))
         if cursor.rowcount > 0:
             conn.commit()
+            auth_manager.invalidate_stats()
             flash(f'成功删除授权码: {code}', 'success')
         else:
             flash('授权码不存在', 'error')
     except Exception as e:
         flash(f'删除失败: {str(e)}', 'error')
-    finally:
-        conn.close()
 
     return redirect(url_for('admin_codes'))
 
 
 
+def csv_field_sql(column: str) -> str:
+    """
+    生成在SQL中按CSV规则输出文本列的表达式（与 csv.writer 默认规则一致，含特殊字符时才加引号）
+    
+    Args:
+        column: 列名
+        
+    Returns:
+        str: SQL表达式
+    """
+    return (
+        f"CASE WHEN {column} GLOB '*[,\"' || char(13, 10) || ']*' "
+        f"THEN '\"' || REPLACE({column}, '\"', '\"\"') || '\"' ELSE {column} END"
+    )
+
+# 导出CSV的表头和每行内容（行文本直接在SQL中拼接，Python只负责输出）
+# 导入的授权码和创建时间来自用户输入，需要按CSV规则转义；其余字段由程序生成
+EXPORT_CSV_HEADER = '授权码,创建时间,是否激活,激活时间,查询次数\r\n'
+EXPORT_CSV_ROW = f"""
+    {csv_field_sql('code')} || ',' || {csv_field_sql('created_date')} || ','
+    || CASE WHEN activated THEN '是' ELSE '否' END || ','
+    || COALESCE(activation_date, '') || ','
+    || COALESCE(query_count, 0) || char(13, 10)
+"""
+
 @app.route('/admin/export')
 @admin_required
 def admin_export():
     """导出数据"""
     codes_param = request.args.get('codes')
 
-    conn = auth_manager.get_db_connection()
+    # 流式响应在请求拆除之后才被迭代，连接由生成器持有并在导出结束后归还
+    conn = auth_manager.detach_connection()
     cursor = conn.cursor()
+    # 每行只有一列拼接好的文本，使用普通元组即可
+    cursor.row_factory = None
 
-    try:
-        if codes_param:
-            codes_list = codes_param.split(',')
-            placeholders = ','.join(['?' for _ in codes_list])
-            cursor.execute(f"SELECT * FROM auth_codes WHERE code IN ({placeholders})", codes_list)
-        else:
-            cursor.execute("SELECT * FROM auth_codes ORDER BY created_date DESC")
-
-        codes = cursor.fetchall()
-
-        import csv
-        import io
-
-        output = io.StringIO()
-        writer = csv.writer(output)
-
-        writer.writerow(['授权码', '创建时间', '是否激活', '激活时间', '查询次数'])
-
-        for code in codes:
-            writer.writerow([
-                code[1],  # code
-                code[2],  # created_date
-                '是' if code[3] else '否',  # activated
-                code[4] or '',  # activation_date
-                code[7] or 0   # query_count
-            ])
-
-        output.seek(0)
-
-        from flask import Response
-        return Response(
-            output.getvalue(),
-            mimetype='text/csv',
-            headers={
-                'Content-Disposition': f'attachment; filename=auth_codes_{datetime.now().strftime("%Y%m%d_%H%M%S")}.csv'
-            }
+    if codes_param:
+        # 选中的授权码可能很多，按块查询以免超出 SQLite 参数个数上限
+        queries = in_clause_queries(
+            f"SELECT {EXPORT_CSV_ROW} FROM auth_codes WHERE code IN ({{}})", codes_param.split(',')
         )
+    else:
+        queries = [(f"SELECT {EXPORT_CSV_ROW} FROM auth_codes ORDER BY created_date DESC", [])]
 
+    try:
+        # 第一条语句在返回响应前执行，出错时仍可提示并跳转
+        cursor.execute(*queries[0])
     except Exception as e:
+        auth_manager.return_connection(conn)
         flash(f'导出失败: {str(e)}', 'error')
         return redirect(url_for('admin_codes'))
-    finally:
-        conn.close()
 
-@app.route('/admin/system-info')
-@admin_required
-def admin_system_info():
-    """系统信息"""
-    try:
-        import psutil
-        import platform
-
-        system_info = {
-            'platform': platform.platform(),
-            'python_version': platform.python_version(),
-            'cpu_count': psutil.cpu_count(),
-            'memory_total': psutil.virtual_memory().total // (1024**3),  # GB
-            'memory_used': round(psutil.virtual_memory().percent, 1),
-            'disk_total': psutil.disk_usage('/').total // (1024**3),  # GB
-            'disk_used': round(psutil.disk_usage('/').percent, 1),
-            'uptime': str(datetime.now() - datetime.fromtimestamp(psutil.boot_time())).split('.')[0],
+    def generate():
+        """按块读取游标并输出CSV，每次只在内存中保留一块数据"""
+        try:
+            yield EXPORT_CSV_HEADER
+
+            for i, (sql, params) in enumerate(queries):
+                if i:
+                    cursor.execute(sql, params)
+                while True:
+                    rows = cursor.fetchmany(500)
+                    if not rows:
+                        break
+                    yield ''.join(row[0] for row in rows)
+        finally:
+            cursor.close()
+            auth_manager.return_connection(conn)
+
+    return Response(
+        generate(),
+        mimetype='text/csv',
+        headers={
+            'Content-Disposition': f'attachment; filename=auth_codes_{datetime.now().strftime("%Y%m%d_%H%M%S")}.csv'
         }
-    except ImportError:
+    )
+
+# 平台信息在进程生命周期内不变，导入时读取一次
+PLATFORM_INFO = {
+    'platform': platform.platform(),
+    'python_version': platform.python_version(),
+}
+
+UNKNOWN_SYSTEM_INFO = {
+    'cpu_count': 'Unknown',
+    'memory_total': 'Unknown',
+    'memory_used': 'Unknown',
+    'disk_total': 'Unknown',
+    'disk_used': 'Unknown',
+    'uptime': 'Unknown',
+}
+
+@functools.lru_cache(maxsize=None)
+def get_boot_time() -> datetime:
+    """系统启动时间（不会变化，只读取一次）"""
+    return datetime.fromtimestamp(psutil.boot_time())
+
+@functools.lru_cache(maxsize=1)
+def get_system_info_snapshot(bucket: int) -> Tuple[Dict, Dict]:
+    """
+    读取系统和数据库信息（按时间段缓存，同一时间段内的请求复用结果）
+    
+    Args:
+        bucket: 时间段编号，由当前时间除以 Config.SYSTEM_INFO_TTL 得到
+        
+    Returns:
+        Tuple[Dict, Dict]: (系统信息, 数据库信息)
+    """
+    if psutil is None:
         # 如果psutil不可用，使用基本信息
-        import platform
-        system_info = {
-            'platform': platform.platform(),
-            'python_version': platform.python_version(),
-            'cpu_count': 'Unknown',
-            'memory_total': 'Unknown',
-            'memory_used': 'Unknown',
-            'disk_total': 'Unknown',
-            'disk_used': 'Unknown',
-            'uptime': 'Unknown',
-        }
-    except Exception as e:
-        logger.error(f"获取系统信息失败: {e}")
-        system_info = {
-            'platform': 'Unknown',
-            'python_version': 'Unknown',
-            'cpu_count': 'Unknown',
-            'memory_total': 'Unknown',
-            'memory_used': 'Unknown',
-            'disk_total': 'Unknown',
-            'disk_used': 'Unknown',
-            'uptime': 'Unknown',
-        }
+        system_info = {**PLATFORM_INFO, **UNKNOWN_SYSTEM_INFO}
+    else:
+        try:
+            memory = psutil.virtual_memory()
+            disk = psutil.disk_usage('/')
+            system_info = {
+                **PLATFORM_INFO,
+                'cpu_count': psutil.cpu_count(),
+                'memory_total': memory.total // (1024**3),  # GB
+                'memory_used': round(memory.percent, 1),
+                'disk_total': disk.total // (1024**3),  # GB
+                'disk_used': round(disk.percent, 1),
+                'uptime': str(datetime.now() - get_boot_time()).split('.')[0],
+            }
+        except Exception as e:
+            logger.error(f"获取系统信息失败: {e}")
+            system_info = {**PLATFORM_INFO, **UNKNOWN_SYSTEM_INFO}
 
-    # 数据库信息
+    # 数据库信息（一次 stat 同时得到是否存在和文件大小）
+    try:
+        db_size = os.stat(auth_manager.db_path).st_size
+        db_exists = True
+    except OSError:
+        db_size = 0
+        db_exists = False
     db_info = {
         'path': auth_manager.db_path,
-        'size_mb': os.path.getsize(auth_manager.db_path) / (1024**2) if os.path.exists(auth_manager.db_path) else 0,
-        'exists': os.path.exists(auth_manager.db_path)
+        'size_mb': db_size / (1024**2),
+        'exists': db_exists
     }
 
+    return system_info, db_info
+
+@app.route('/admin/system-info')
+@admin_required
+def admin_system_info():
+    """系统信息"""
+    system_info, db_info = get_system_info_snapshot(int(time.monotonic() // Config.SYSTEM_INFO_TTL))
+
     return render_template('admin_system_info.html',
                          system_info=system_info,
                          db_info=db_info,
@@ -937,15 +1136,17 @@ def admin_bulk_action():
         cursor = conn.cursor()
 
         try:
-            placeholders = ','.join(['?' for _ in selected_codes])
-            cursor.execute(f"DELETE FROM auth_codes WHERE code IN ({placeholders})", selected_codes)
-            deleted_count = cursor.rowcount
+            # 按块删除以免超出 SQLite 参数个数上限，整体在一个事务中提交
+            deleted_count = 0
+            for sql, params in in_clause_queries("DELETE FROM auth_codes WHERE code IN ({})", selected_codes):
+                cursor.execute(sql, params)
+                deleted_count += cursor.rowcount
             conn.commit()
+            auth_manager.invalidate_stats()
             flash(f'成功删除 {deleted_count} 个授权码', 'success')
         except Exception as e:
+            conn.rollback()
             flash(f'批量删除失败: {str(e)}', 'error')
-        finally:
-            conn.close()
 
     elif action == 'export':
         # 导出选中的授权码
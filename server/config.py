@@ -6,6 +6,9 @@
 
 import os
 import secrets
+import hashlib
+import hmac
+import functools
 from datetime import timedelta
 
 class Config:
@@ -17,6 +20,7 @@ class Config:
     
     # 数据库配置
     DATABASE_PATH = os.environ.get('DATABASE_PATH') or 'data/musicqr.db'
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', '8'))  # 连接池保留的空闲连接数
     
     # API配置
     API_KEY_SALT = os.environ.get('API_KEY_SALT') or 'musicqr_api_salt_2024'
@@ -24,6 +28,12 @@ class Config:
     # 安全配置
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB
     
+    # 统计信息缓存时间（秒）
+    STATS_TTL = float(os.environ.get('STATS_TTL', '5'))
+    
+    # 系统信息页面的指标缓存时间（秒）
+    SYSTEM_INFO_TTL = float(os.environ.get('SYSTEM_INFO_TTL', '2'))
+    
     # 日志配置
     LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO')
     LOG_FILE = os.environ.get('LOG_FILE', 'logs/musicqr_api.log')
@@ -99,6 +109,15 @@ def get_config(config_name=None):
     return config.get(config_name, config['default'])
 
 # API密钥生成工具
+@functools.lru_cache(maxsize=8)
+def _derive_api_key(secret_key: str, salt: str) -> str:
+    """根据密钥和盐值派生API密钥（结果按参数缓存）"""
+    return hmac.new(
+        secret_key.encode(),
+        salt.encode(),
+        hashlib.sha256
+    ).hexdigest()
+
 def generate_api_key(secret_key: str = None, salt: str = None) -> str:
     """
     生成API密钥
@@ -110,19 +129,12 @@ def generate_api_key(secret_key: str = None, salt: str = None) -> str:
     Returns:
         str: API密钥
     """
-    import hashlib
-    import hmac
-    
     if not secret_key:
         secret_key = Config.SECRET_KEY
     if not salt:
         salt = Config.API_KEY_SALT
     
-    return hmac.new(
-        secret_key.encode(),
-        salt.encode(),
-        hashlib.sha256
-    ).hexdigest()
+    return _derive_api_key(secret_key, salt)
 
 if __name__ == '__main__':
     # 测试配置
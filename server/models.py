@@ -6,7 +6,9 @@
 
 import sqlite3
 import os
-from datetime import datetime
+import queue
+from contextlib import closing, contextmanager
+from datetime import datetime, timedelta
 from typing import Optional, Dict, List
 
 class AuthCode:
@@ -47,6 +49,157 @@ class AuthCode:
         auth_code.last_query_date = data.get('last_query_date')
         return auth_code
 
+# 连接级 PRAGMA 设置（journal_mode=WAL 持久写入数据库文件，由 init_db 设置一次）
+CONNECTION_PRAGMAS = (
+    'PRAGMA synchronous=NORMAL',      # WAL 模式下只在检查点时 fsync
+    'PRAGMA temp_store=MEMORY',       # 临时表和排序放在内存中
+    'PRAGMA mmap_size=268435456',     # 256MB 内存映射读取
+    'PRAGMA cache_size=-65536',       # 64MB 页缓存
+)
+
+# 每个连接缓存的已编译语句数量（默认128），保证常用语句不会被挤出缓存
+CACHED_STATEMENTS = 256
+
+# 常用写入语句：语句缓存按SQL文本匹配，各处共用同一文本才能复用编译结果
+SQL_INSERT_CODE = (
+    "INSERT INTO auth_codes (code, created_date, activated, query_count) "
+    "VALUES (?, ?, FALSE, 0)"
+)
+SQL_INSERT_CODE_OR_IGNORE = (
+    "INSERT OR IGNORE INTO auth_codes (code, created_date, activated, query_count) "
+    "VALUES (?, ?, FALSE, 0)"
+)
+
+def configure_connection(conn: sqlite3.Connection) -> sqlite3.Connection:
+    """
+    为新打开的连接应用 PRAGMA 设置
+    
+    Args:
+        conn: 数据库连接
+        
+    Returns:
+        sqlite3.Connection: 同一个连接
+    """
+    for pragma in CONNECTION_PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
+class SQLiteConnectionPool:
+    """SQLite 连接池（后进先出，优先复用最近使用、页缓存最热的连接）"""
+    
+    def __init__(self, db_path: str, max_size: int = 8, row_factory=None):
+        self.db_path = db_path
+        self.row_factory = row_factory
+        self._pool = queue.LifoQueue(maxsize=max_size)
+    
+    def _connect(self) -> sqlite3.Connection:
+        """创建并配置新连接（连接会在线程间传递，关闭同线程检查）"""
+        conn = configure_connection(sqlite3.connect(
+            self.db_path, check_same_thread=False, cached_statements=CACHED_STATEMENTS
+        ))
+        if self.row_factory is not None:
+            conn.row_factory = self.row_factory
+        return conn
+    
+    def get(self) -> sqlite3.Connection:
+        """取出一个空闲连接，没有空闲连接时新建"""
+        try:
+            return self._pool.get_nowait()
+        except queue.Empty:
+            return self._connect()
+    
+    def put(self, conn: sqlite3.Connection):
+        """归还连接：回滚未提交的事务，连接池已满时直接关闭"""
+        if conn.in_transaction:
+            conn.rollback()
+        try:
+            self._pool.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+    
+    @contextmanager
+    def acquire(self):
+        """以上下文管理器方式借用连接"""
+        conn = self.get()
+        try:
+            yield conn
+        finally:
+            self.put(conn)
+
+# 数据库结构（所有语句幂等，可在已有数据库上重复执行）
+SCHEMA_SQL = '''
+BEGIN;
+
+-- 创建授权码表
+CREATE TABLE IF NOT EXISTS auth_codes (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    code VARCHAR(12) UNIQUE NOT NULL,
+    created_date DATETIME NOT NULL,
+    activated BOOLEAN DEFAULT FALSE,
+    activation_date DATETIME NULL,
+    activation_ip VARCHAR(45) NULL,
+    activation_user_agent TEXT NULL,
+    query_count INTEGER DEFAULT 0,
+    last_query_date DATETIME NULL,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+);
+
+-- 创建索引以提高查询性能（code 列的 UNIQUE 约束已自带索引，无需再单独建索引）
+-- 删除旧版本创建的重复索引
+DROP INDEX IF EXISTS idx_code;
+-- (activated, activation_date) 复合索引：已激活数、本周激活数和最近激活列表均可只查索引
+-- 其前缀同时覆盖单列 activated 索引，旧版本的 idx_activated 一并删除
+DROP INDEX IF EXISTS idx_activated;
+CREATE INDEX IF NOT EXISTS idx_activated_date ON auth_codes(activated, activation_date);
+CREATE INDEX IF NOT EXISTS idx_activation_date ON auth_codes(activation_date);
+CREATE INDEX IF NOT EXISTS idx_last_query_date ON auth_codes(last_query_date);
+-- 管理后台按创建时间游标分页（索引隐含 rowid，即 id）
+CREATE INDEX IF NOT EXISTS idx_created_date ON auth_codes(created_date);
+
+-- 计数表：由触发器维护授权码总数和已激活数，统计时无需 COUNT(*) 全表扫描
+CREATE TABLE IF NOT EXISTS auth_counts (
+    name VARCHAR(20) PRIMARY KEY,
+    value INTEGER NOT NULL DEFAULT 0
+);
+CREATE TRIGGER IF NOT EXISTS trg_auth_codes_insert AFTER INSERT ON auth_codes
+BEGIN
+    UPDATE auth_counts SET value = value + 1 WHERE name = 'total';
+    UPDATE auth_counts SET value = value + 1 WHERE name = 'activated' AND NEW.activated;
+END;
+CREATE TRIGGER IF NOT EXISTS trg_auth_codes_delete AFTER DELETE ON auth_codes
+BEGIN
+    UPDATE auth_counts SET value = value - 1 WHERE name = 'total';
+    UPDATE auth_counts SET value = value - 1 WHERE name = 'activated' AND OLD.activated;
+END;
+CREATE TRIGGER IF NOT EXISTS trg_auth_codes_activate AFTER UPDATE OF activated ON auth_codes
+WHEN (CASE WHEN NEW.activated THEN 1 ELSE 0 END) != (CASE WHEN OLD.activated THEN 1 ELSE 0 END)
+BEGIN
+    UPDATE auth_counts
+    SET value = value + (CASE WHEN NEW.activated THEN 1 ELSE -1 END)
+    WHERE name = 'activated';
+END;
+-- 首次创建时按已有数据初始化计数
+INSERT OR IGNORE INTO auth_counts (name, value) SELECT 'total', COUNT(*) FROM auth_codes;
+INSERT OR IGNORE INTO auth_counts (name, value)
+SELECT 'activated', COUNT(*) FROM auth_codes WHERE activated;
+
+-- 创建查询日志表（可选，用于详细统计）
+CREATE TABLE IF NOT EXISTS query_logs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    code VARCHAR(12) NOT NULL,
+    client_ip VARCHAR(45),
+    user_agent TEXT,
+    query_time DATETIME DEFAULT CURRENT_TIMESTAMP,
+    result VARCHAR(20) NOT NULL,
+    FOREIGN KEY (code) REFERENCES auth_codes(code)
+);
+CREATE INDEX IF NOT EXISTS idx_query_time ON query_logs(query_time);
+CREATE INDEX IF NOT EXISTS idx_query_code ON query_logs(code);
+
+COMMIT;
+'''
+
 def init_db(db_path: str = 'musicqr.db'):
     """
     初始化数据库
@@ -60,48 +213,13 @@ def init_db(db_path: str = 'musicqr.db'):
         os.makedirs(db_dir)
     
     conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
     
-    # 创建授权码表
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS auth_codes (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            code VARCHAR(12) UNIQUE NOT NULL,
-            created_date DATETIME NOT NULL,
-            activated BOOLEAN DEFAULT FALSE,
-            activation_date DATETIME NULL,
-            activation_ip VARCHAR(45) NULL,
-            activation_user_agent TEXT NULL,
-            query_count INTEGER DEFAULT 0,
-            last_query_date DATETIME NULL,
-            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-            updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
+    # WAL 模式写入数据库文件，之后所有连接均生效：读不阻塞写，提交时少一次 fsync
+    conn.execute('PRAGMA journal_mode=WAL')
+    configure_connection(conn)
     
-    # 创建索引以提高查询性能
-    cursor.execute('CREATE INDEX IF NOT EXISTS idx_code ON auth_codes(code)')
-    cursor.execute('CREATE INDEX IF NOT EXISTS idx_activated ON auth_codes(activated)')
-    cursor.execute('CREATE INDEX IF NOT EXISTS idx_activation_date ON auth_codes(activation_date)')
-    cursor.execute('CREATE INDEX IF NOT EXISTS idx_last_query_date ON auth_codes(last_query_date)')
-    
-    # 创建查询日志表（可选，用于详细统计）
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS query_logs (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            code VARCHAR(12) NOT NULL,
-            client_ip VARCHAR(45),
-            user_agent TEXT,
-            query_time DATETIME DEFAULT CURRENT_TIMESTAMP,
-            result VARCHAR(20) NOT NULL,
-            FOREIGN KEY (code) REFERENCES auth_codes(code)
-        )
-    ''')
-    
-    cursor.execute('CREATE INDEX IF NOT EXISTS idx_query_time ON query_logs(query_time)')
-    cursor.execute('CREATE INDEX IF NOT EXISTS idx_query_code ON query_logs(code)')
-    
-    conn.commit()
+    # 全部建表、索引和触发器语句一次提交，在同一个事务中执行
+    conn.executescript(SCHEMA_SQL)
     conn.close()
     
     print(f"✅ 数据库初始化完成: {db_path}")
@@ -128,12 +246,10 @@ def backup_database(db_path: str = 'musicqr.db', backup_dir: str = 'backups'):
     backup_path = os.path.join(backup_dir, backup_filename)
     
     try:
-        # 使用SQLite的备份API
-        source = sqlite3.connect(db_path)
-        backup = sqlite3.connect(backup_path)
-        source.backup(backup)
-        backup.close()
-        source.close()
+        # 使用SQLite的备份API，一步复制全部页面（默认逐页复制，每页都要重新加锁）
+        with closing(sqlite3.connect(db_path)) as source, \
+                closing(sqlite3.connect(backup_path)) as backup:
+            source.backup(backup, pages=-1)
         
         print(f"✅ 数据库备份完成: {backup_path}")
         return True
@@ -155,19 +271,27 @@ def get_database_stats(db_path: str = 'musicqr.db') -> Dict:
     if not os.path.exists(db_path):
         return {}
     
-    conn = sqlite3.connect(db_path)
+    conn = configure_connection(sqlite3.connect(db_path))
     cursor = conn.cursor()
     
     try:
         stats = {}
         
-        # 总授权码数量
-        cursor.execute("SELECT COUNT(*) FROM auth_codes")
-        stats['total_codes'] = cursor.fetchone()[0]
-        
-        # 已激活数量
-        cursor.execute("SELECT COUNT(*) FROM auth_codes WHERE activated = TRUE")
-        stats['activated_codes'] = cursor.fetchone()[0]
+        # 总数、已激活数、今日查询数和本周激活数在一条语句中统计
+        # 日期条件使用预先计算的范围边界（列上套 DATE() 会使索引失效），每个子查询只扫描索引
+        today = datetime.now().date()
+        cursor.execute("""
+            SELECT
+                (SELECT COUNT(*) FROM auth_codes),
+                (SELECT COUNT(*) FROM auth_codes WHERE activated = TRUE),
+                (SELECT COUNT(*) FROM auth_codes
+                 WHERE last_query_date >= ? AND last_query_date < ?),
+                (SELECT COUNT(*) FROM auth_codes
+                 WHERE activated = TRUE AND activation_date >= ?)
+        """, (today.isoformat(), (today + timedelta(days=1)).isoformat(),
+              (today - timedelta(days=7)).isoformat()))
+        (stats['total_codes'], stats['activated_codes'],
+         stats['today_queries'], stats['week_activations']) = cursor.fetchone()
         
         # 激活率
         if stats['total_codes'] > 0:
@@ -175,19 +299,6 @@ def get_database_stats(db_path: str = 'musicqr.db') -> Dict:
         else:
             stats['activation_rate'] = 0
         
-        # 今日查询数量
-        today = datetime.now().date().isoformat()
-        cursor.execute("SELECT COUNT(*) FROM auth_codes WHERE DATE(last_query_date) = ?", (today,))
-        stats['today_queries'] = cursor.fetchone()[0]
-        
-        # 本周激活数量
-        cursor.execute("""
-            SELECT COUNT(*) FROM auth_codes 
-            WHERE activated = TRUE 
-            AND DATE(activation_date) >= DATE('now', '-7 days')
-        """)
-        stats['week_activations'] = cursor.fetchone()[0]
-        
         # 最近激活的授权码
         cursor.execute("""
             SELECT code, activation_date 
@@ -222,17 +333,19 @@ def cleanup_old_logs(db_path: str = 'musicqr.db', days: int = 30):
         db_path: 数据库文件路径
         days: 保留天数
     """
-    conn = sqlite3.connect(db_path)
+    conn = configure_connection(sqlite3.connect(db_path))
     cursor = conn.cursor()
     
     try:
-        cursor.execute("""
-            DELETE FROM query_logs 
-            WHERE query_time < DATE('now', '-{} days')
-        """.format(days))
+        # 天数作为日期修饰符参数传入，语句文本固定，可复用已编译的语句
+        # query_time 由 CURRENT_TIMESTAMP 填充（UTC），截止时间同样由 SQLite 按 UTC 计算
+        with conn:
+            cursor.execute("""
+                DELETE FROM query_logs 
+                WHERE query_time < DATE('now', ?)
+            """, (f'-{int(days)} days',))
         
         deleted_count = cursor.rowcount
-        conn.commit()
         
         print(f"✅ 清理了 {deleted_count} 条旧日志记录")
         